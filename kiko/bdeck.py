@@ -1,6 +1,11 @@
 #https://gist.github.com/crazyapril/8c2303f539aa5e1b71d09da8744eada0
 
+import dataclasses
 import datetime
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
 
 
 class AttrDict(dict):
@@ -10,6 +15,73 @@ class AttrDict(dict):
         self.__dict__ = self
 
 
+@dataclasses.dataclass(slots=True)
+class AdvisoryRecord:
+    """Data of a single timepoint in BDeck file. Entries could be accessed
+    both as attributes and as keys. Entries not available in the file, e.g.
+    `pres` for short type, are left as None.
+    """
+    _long_format: bool = False
+    basin: str = ''
+    number: int = -999
+    timestr: str = ''
+    time: Optional[datetime.datetime] = None
+    technum: str = ''
+    techcode: str = ''
+    tau: int = -999
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    wind: int = -999
+    category: str = ''
+    raw_category: str = ''
+    pres: Optional[int] = None
+    r34: Optional[tuple] = None
+    r50: Optional[tuple] = None
+    r64: Optional[tuple] = None
+    lci: Optional[int] = None
+    lci_radius: Optional[int] = None
+    rmw: Optional[int] = None
+    name: Optional[str] = None
+    depth: Optional[str] = None
+
+    def __getitem__(self, key):
+        if key not in _RECORD_FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        # Like a dict, entries not available in the file are not contained
+        return key in _RECORD_FIELD_SET and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        if key in self:
+            return getattr(self, key)
+        return default
+
+    def keys(self):
+        return [key for key in _RECORD_FIELDS if key in self]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+
+# Entries recorded for short type, short type with pressure, long type and
+# long type with name, each one extends the previous one
+_RECORD_FIELDS = tuple(f.name for f in dataclasses.fields(AdvisoryRecord))
+_RECORD_FIELD_SET = frozenset(_RECORD_FIELDS)
+_SHORT_FIELDS = _RECORD_FIELDS.index('pres')
+_PRES_FIELDS = _RECORD_FIELDS.index('r34')
+_LONG_FIELDS = _RECORD_FIELDS.index('name')
+_NAMED_FIELDS = len(_RECORD_FIELDS)
+_MISSING_RADII = (-999, -999, -999, -999)
+# Raw categories which would be reclassified by wind speed
+_RECLASSIFY = frozenset({None, 'TY', 'HU', 'ST', 'MH'})
+_CAT_LUT_MAX = 200
+
+
 def _safe_int(s):
     try:
         return int(s)
@@ -17,6 +89,11 @@ def _safe_int(s):
         return -999
 
 
+def _parse_timestr(s):
+    """Parse a 'YYYYmmddHH' string, much faster than `strptime`."""
+    return datetime.datetime(int(s[:4]), int(s[4:6]), int(s[6:8]), int(s[8:10]))
+
+
 class BDeckFile:
     """Reader for BDeck format files.
     You could access data step by step or once for all. For data in a single
@@ -97,6 +174,13 @@ class BDeckFile:
     ```
     """
 
+    # Upper bounds (inclusive) of wind speed for SSHWS categories
+    _CAT_THRESH = np.array([34, 64, 83, 96, 114, 137])
+    _CAT_NAMES = np.array(['TD', 'TS', 'C1', 'C2', 'C3', 'C4', 'C5'])
+    # SSHWS category of each wind speed, for classifying a single record
+    _CAT_LUT = tuple(_CAT_NAMES[np.searchsorted(_CAT_THRESH,
+        np.arange(_CAT_LUT_MAX + 1))].tolist())
+
     def __init__(self, filename):
         """Initiating a BDeckFile instance by feeding the filename of BDeck
         file.
@@ -123,11 +207,16 @@ class BDeckFile:
     def open(self):
         """Open the given BDeck file."""
         if not self._opened:
-            self.file = open(self.filename)
+            # The whole file is read at once, so use a large buffer
+            self.file = open(self.filename, 'rb', buffering=1 << 20)
         self._opened = True
         self.data = AttrDict()
-        self.idata = AttrDict()
+        self.idata = AdvisoryRecord()
         self.metadata = AttrDict()
+        self._reset_metadata()
+
+    def _reset_metadata(self):
+        """Set metadata to the initial values before reading."""
         self.metadata.update({
             'maxwind': 0,
             'minpres': 9999,
@@ -144,7 +233,7 @@ class BDeckFile:
     def clear(self):
         """Clear data already read and then reset."""
         self.data = AttrDict()
-        self.idata = AttrDict()
+        self.idata = AdvisoryRecord()
         self.metadata = AttrDict()
         self.reset()
         self._fullyread = False
@@ -179,23 +268,26 @@ class BDeckFile:
         category : string, optional
             Raw category information in the file, by default None
         """
-        if category not in (None, 'TY', 'HU', 'ST', 'MH'):
+        if category not in _RECLASSIFY:
             return category
-        if wind > 137:
-            cat = 'C5'
-        elif wind > 114:
-            cat = 'C4'
-        elif wind > 96:
-            cat = 'C3'
-        elif wind > 83:
-            cat = 'C2'
-        elif wind > 64:
-            cat = 'C1'
-        elif wind > 34:
-            cat = 'TS'
-        else:
-            cat = 'TD'
-        return cat
+        return self._CAT_LUT[min(max(wind, 0), _CAT_LUT_MAX)]
+
+    def _get_category_array(self, wind, category):
+        """Vectorized version of `_get_category`, for classifying all the
+        records at once. Empty raw categories are treated as no raw info
+        given.
+        Parameters
+        ----------
+        wind : array_like of int
+            Wind speed in knots.
+        category : array_like of string
+            Raw category information in the file.
+        """
+        wind = np.asarray(wind)
+        category = np.asarray(category, dtype=str)
+        sshws = self._CAT_NAMES[np.searchsorted(self._CAT_THRESH, wind)]
+        reclassify = np.isin(category, ('', 'TY', 'HU', 'ST', 'MH'))
+        return np.where(reclassify, sshws, category)
 
     def read_all(self, formal_advisory=True, tropical_nature=False):
         """Read all data in the file. You can access all the information in
@@ -214,9 +306,73 @@ class BDeckFile:
                 tropical_nature=tropical_nature)
         return self.data
 
+    def read_all_arrays(self, formal_advisory=True, tropical_nature=False):
+        """Read all data in the file like `read_all`, but return a dict of
+        NumPy arrays instead of lists. `time` is given as `datetime64[us]`
+        and radii entries (`r34`, `r50` and `r64`) as integer arrays of shape
+        (N, 4), filled with -999 where not available.
+
+        Parameters
+        ----------
+        formal_advisory : bool, optional
+            Only reads data from formal advisories, i.e. 00z, 06z, 12z and
+            18z, by default True
+        tropical_nature : bool, optional
+            Only reads data when the cyclone has tropical nature, dismisses
+            subtropical and extratropical data, by default False
+        """
+        self.read_data(formal_advisory=formal_advisory,
+                tropical_nature=tropical_nature)
+        arrays = dict()
+        for key, value in self.data.items():
+            if key == 'time':
+                arrays[key] = np.array(value, dtype='datetime64[us]')
+            elif key in ('r34', 'r50', 'r64'):
+                radii = [_MISSING_RADII if i is None else i for i in value]
+                arrays[key] = np.array(radii, dtype=np.int64).reshape(-1, 4)
+            else:
+                arrays[key] = np.array(value)
+        return arrays
+
     def read_data(self, formal_advisory=True, tropical_nature=False):
-        """Get next slice of data in the BDeck file by iteration. After
-        iterating one step, you can access data in the `idata` attribute.
+        """Read the BDeck file from the beginning and write all data into
+        `self.data` and `self.metadata`. `idata` is left with the data of
+        the last step. Use `iter_data` to read the file step by step.
+
+        Parameters
+        ----------
+        formal_advisory : bool, optional
+            Only reads data from formal advisories, i.e. 00z, 06z, 12z and
+            18z, by default True
+        tropical_nature : bool, optional
+            Only reads data when the cyclone has tropical nature, dismisses
+            subtropical and extratropical data, by default False
+        """
+        # Columns are collected locally and written into `self.data` at once
+        columns = defaultdict(list)
+        idata = self.idata
+        for nfields in self._iter_records(formal_advisory, tropical_nature):
+            for key in _RECORD_FIELDS[:nfields]:
+                columns[key].append(getattr(idata, key))
+            self._record_meta()
+        if columns and not self._fullyread:
+            category = self._get_category_array(columns['wind'],
+                columns['raw_category']).tolist()
+            columns['category'] = category
+            idata.category = category[-1]
+            self.data.update(columns)
+        self._fullyread = True
+
+    def iter_data(self, formal_advisory=True, tropical_nature=False):
+        """Iterate over the BDeck file step by step, yielding the time of
+        each step. Data of the current step is in the `idata` attribute.
+        Note the whole file is read and decoded into memory on the first
+        step, only the parsing of lines is lazy. Stopping early saves the
+        parsing of the remaining lines, but not reading them. Once the
+        iteration is finished, all the information is also available in
+        `self.data` and `self.metadata`. Every iteration starts from the
+        beginning of the file, so an iteration stopped early could be
+        followed by `read_all` or another `iter_data`.
 
         Parameters
         ----------
@@ -227,101 +383,126 @@ class BDeckFile:
             Only reads data when the cyclone has tropical nature, dismisses
             subtropical and extratropical data, by default False
         """
+        columns = defaultdict(list)
+        idata = self.idata
+        for nfields in self._iter_records(formal_advisory, tropical_nature):
+            idata.category = self._get_category(idata.wind,
+                idata.raw_category or None)
+            for key in _RECORD_FIELDS[:nfields]:
+                columns[key].append(getattr(idata, key))
+            self._record_meta()
+            yield idata.time
+        if not self._fullyread:
+            self.data.update(columns)
+        self._fullyread = True
+
+    def _iter_records(self, formal_advisory, tropical_nature):
+        """Parse the file line by line, fill `self.idata` with each record
+        and yield the number of entries in `_RECORD_FIELDS` which are valid
+        so far. `category` is left empty for the caller to classify.
+        """
         if not self._opened:
             raise IOError('The file has not been opened!')
-        lines = self.file.readlines()
-        count = len(lines)
-        i = 0
+        # Always start over, a previous pass may have been stopped early
+        self.reset()
+        if not self._fullyread:
+            # Drop metadata recorded by an unfinished pass
+            self._reset_metadata()
+        # Read and decode the whole file in one go, only the parsing below
+        # is lazy
+        lines = iter(self.file.read().decode('utf-8', 'replace').splitlines())
+        # Line read ahead for r50/r64 but belonging to the next record
+        pending = None
         last_timestr = ''
-        while i < count:
-            line = lines[i]
-            linesegs = line.split(',')
+        cached_timestr, cached_time = '', None
+        # Local alias, avoid attribute lookups for every record
+        idata = self.idata
+        nfields = _SHORT_FIELDS
+        while True:
+            if pending is None:
+                line = next(lines, None)
+                if line is None:
+                    return
+                linesegs = line.split(',')
+            else:
+                linesegs, pending = pending, None
             _long_format = len(linesegs) > 20
             # check if it is formal advisories
             if formal_advisory and linesegs[2][-2:] not in ('00', '06', '12', '18'):
-                i += 1
                 continue
             # check if it has tropical nature
             if _long_format and tropical_nature and \
                     linesegs[10].strip() in ('SS', 'SD', 'EX'):
-                i += 1
                 continue
-            self.idata['_long_format'] = _long_format
-            self.idata['basin'] = linesegs[0]
-            self.idata['number'] = _safe_int(linesegs[1])
-            timestr = linesegs[2].strip()
+            idata._long_format = _long_format
+            idata.basin = linesegs[0]
+            idata.number = _safe_int(linesegs[1])
+            raw_timestr = linesegs[2]
+            timestr = raw_timestr.strip()
             if not _long_format and last_timestr == timestr:
                 # Duplicated time, which sholdn't be happending
-                i += 1
                 continue
-            self.idata['timestr'] = timestr
-            self.idata['time'] = datetime.datetime.strptime(timestr, '%Y%m%d%H')
-            self.idata['technum'] = linesegs[3].strip()
-            self.idata['techcode'] = linesegs[4].strip()
-            self.idata['tau'] = _safe_int(linesegs[5])
-            lat = _safe_int(linesegs[6][:-1]) / 10
-            if linesegs[6][-1] == 'S':
-                lat = -lat
-            self.idata['lat'] = lat
-            lon = _safe_int(linesegs[7][:-1]) / 10
-            if linesegs[7][-1] == 'W':
-                lon = -lon
-            self.idata['lon'] = lon
+            idata.timestr = timestr
+            if timestr != cached_timestr:
+                # Consecutive lines usually share the same timestamp
+                cached_timestr, cached_time = timestr, _parse_timestr(timestr)
+            idata.time = cached_time
+            idata.technum = linesegs[3].strip()
+            idata.techcode = linesegs[4].strip()
+            idata.tau = _safe_int(linesegs[5])
+            latstr = linesegs[6]
+            lat = _safe_int(latstr[:-1]) / 10
+            idata.lat = -lat if latstr[-1] == 'S' else lat
+            lonstr = linesegs[7]
+            lon = _safe_int(lonstr[:-1]) / 10
+            idata.lon = -lon if lonstr[-1] == 'W' else lon
             wind = _safe_int(linesegs[8])
-            self.idata['wind'] = wind
-            self.idata['category'] = self._get_category(wind)
-            self.idata['raw_category'] = ''
+            idata.wind = wind
+            idata.category = ''
+            idata.raw_category = ''
             if len(linesegs) > 9:
-                self.idata['pres'] = _safe_int(linesegs[9])
+                nfields = max(nfields, _PRES_FIELDS)
+                idata.pres = _safe_int(linesegs[9])
                 tmp_str = linesegs[10].strip()
-                self.idata['category'] = self._get_category(wind, tmp_str)
-                self.idata['raw_category'] = tmp_str
+                idata.raw_category = tmp_str
             if _long_format:
-                self.idata['r34'] = None
-                self.idata['r50'] = None
-                self.idata['r64'] = None
-                self.idata['lci'] = _safe_int(linesegs[17]) # last closed isobar
-                self.idata['lci_radius'] = _safe_int(linesegs[18])
-                self.idata['rmw'] = _safe_int(linesegs[19])
+                nfields = max(nfields, _LONG_FIELDS)
+                idata.r34 = None
+                idata.r50 = None
+                idata.r64 = None
+                idata.lci = _safe_int(linesegs[17]) # last closed isobar
+                idata.lci_radius = _safe_int(linesegs[18])
+                idata.rmw = _safe_int(linesegs[19])
                 if len(linesegs) > 28:
-                    self.idata['name'] = linesegs[27].strip()
-                    self.idata['depth'] = linesegs[28].strip()
+                    nfields = _NAMED_FIELDS
+                    idata.name = linesegs[27].strip()
+                    idata.depth = linesegs[28].strip()
                 if wind > 34:
-                    self.idata['r34'] = tuple(map(int, linesegs[13:17]))
+                    idata.r34 = tuple(map(int, linesegs[13:17]))
                 if wind >= 50:
-                    i += 1
-                    if i == count:
-                        break
-                    line = lines[i]
+                    line = next(lines, None)
+                    if line is None:
+                        return
                     linesegs = line.split(',')
-                    if linesegs[2].strip() != timestr:
+                    # Continuation lines have the same column layout, so
+                    # the raw field usually matches without stripping
+                    if linesegs[2] != raw_timestr and \
+                            linesegs[2].strip() != timestr:
+                        pending = linesegs
                         continue
-                    self.idata['r50'] = tuple(map(int, linesegs[13:17]))
+                    idata.r50 = tuple(map(int, linesegs[13:17]))
                 if wind > 64:
-                    i += 1
-                    if i == count:
-                        break
-                    line = lines[i]
+                    line = next(lines, None)
+                    if line is None:
+                        return
                     linesegs = line.split(',')
-                    if linesegs[2].strip() != timestr:
+                    if linesegs[2] != raw_timestr and \
+                            linesegs[2].strip() != timestr:
+                        pending = linesegs
                         continue
-                    self.idata['r64'] = tuple(map(int, linesegs[13:17]))
-            self._record_all()
-            self._record_meta()
+                    idata.r64 = tuple(map(int, linesegs[13:17]))
             last_timestr = timestr
-            i += 1
-            #print(line)
-        self._fullyread = True
-
-    def _record_all(self):
-        """Write single time information into `self.data`."""
-        if self._fullyread:
-            return
-        for key, value in self.idata.items():
-            if key not in self.data:
-                self.data[key] = [value]
-            else:
-                self.data[key].append(value)
+            yield nfields
 
     def _record_meta(self):
         """Write metadata into `self.metadata`. Note: metadata would not
@@ -331,14 +512,15 @@ class BDeckFile:
         """
         if self._fullyread:
             return
-        if self.idata['wind'] > self.metadata['maxwind']:
-            self.metadata['maxwind'] = self.idata['wind']
-            self.metadata['peaktime'] = [self.idata['time']]
-            if 'name' in self.idata:
-                self.metadata['name'] = self.idata['name']
-        elif self.idata['wind'] == self.metadata['maxwind']:
-            self.metadata['peaktime'].append(self.idata['time'])
-        if 'pres' in self.idata and self.idata['pres'] < self.metadata['minpres']:
-            self.metadata['minpres'] = self.idata['pres']
-        self.metadata['fullcode'] = '{}{:02d}'.format(self.idata['basin'],
-            self.idata['number'])
\ No newline at end of file
+        idata = self.idata
+        if idata.wind > self.metadata['maxwind']:
+            self.metadata['maxwind'] = idata.wind
+            self.metadata['peaktime'] = [idata.time]
+            if idata.name is not None:
+                self.metadata['name'] = idata.name
+        elif idata.wind == self.metadata['maxwind']:
+            self.metadata['peaktime'].append(idata.time)
+        if idata.pres is not None and idata.pres < self.metadata['minpres']:
+            self.metadata['minpres'] = idata.pres
+        self.metadata['fullcode'] = '{}{:02d}'.format(idata.basin,
+            idata.number)
\ No newline at end of file
@@ -1,9 +1,10 @@
 from calendar import isleap
+from concurrent.futures import ProcessPoolExecutor
 import datetime
 
 import numpy as np
 
-from kiko.storm import Storm
+from kiko.storm import Basin, Storm
 from kiko.utils import datetime_to_mjd, find_overlaps
 
 class SeasonDataset(object):
@@ -18,8 +19,28 @@ class SeasonDataset(object):
             self.storm_dict[s.full_atcf_id] = s
 
     @classmethod
-    def from_bdeck(cls, file_list: list[str]):
-        storms = [Storm.from_bdeck(i) for i in file_list]
+    def from_bdeck(cls, file_list: list[str], n_workers: int | None = None):
+        """Build a dataset from a list of BDeck files.
+
+        Parameters
+        ----------
+        file_list : list of string
+            Full filenames of BDeck files.
+        n_workers : int, optional
+            Number of processes for parsing files in parallel, by default
+            None, i.e. files are parsed serially in the current process,
+            same as 1. Parsing in parallel uses `ProcessPoolExecutor`, so
+            on platforms starting processes by spawn (macOS, Windows), the
+            calling script must be guarded by `if __name__ == '__main__':`.
+            For a few dozen files, starting the processes costs more than
+            it saves.
+        """
+        if n_workers is None or n_workers <= 1:
+            storms = [Storm.from_bdeck(i) for i in file_list]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                storms = list(executor.map(Storm.from_bdeck, file_list,
+                                           chunksize=8))
         return cls(storms)
 
     def daily_ace(self, year: int, push_leap_day: bool = False, basin=None):
@@ -31,18 +52,23 @@ class SeasonDataset(object):
             return ValueError(f'Year {year} not in dataset')
         # TODO: Find a better way to handle missing years
         data_size = 366 if isleap(year) else 365
-        ace = np.zeros(data_size)
+        year_matrix = np.zeros((data_size, len(Basin)))
+        year_start = int(datetime_to_mjd(datetime.datetime(year, 1, 1)))
         for _yr in [year - 1, year, year + 1]:
             if _yr not in self.season_dict:
                 continue
             for storm in self.season_dict[_yr]:
-                for mjd, basin_ace in storm.daily_ace.items():
-                    day_of_year = int(mjd - datetime_to_mjd(datetime.datetime(year, 1, 1)))
-                    if 0 <= day_of_year < data_size:
-                        if basin is None:
-                            ace[day_of_year] += basin_ace.total
-                        else:
-                            ace[day_of_year] += basin_ace.get(basin)
+                mjd_start, matrix = storm.daily_ace_matrix
+                offset = mjd_start - year_start
+                src_start = max(-offset, 0)
+                src_end = min(data_size - offset, len(matrix))
+                if src_start >= src_end:
+                    continue
+                year_matrix[src_start + offset:src_end + offset] += matrix[src_start:src_end]
+        if basin is None:
+            ace = year_matrix.sum(axis=1)
+        else:
+            ace = year_matrix[:, basin]
         if push_leap_day and isleap(year):
             ace[59] += ace[60]  # Add 2/29 data to 3/1
             ace = np.delete(ace, 60)  # Remove 2/29
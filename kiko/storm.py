@@ -3,16 +3,19 @@ import enum
 from dataclasses import dataclass
 from functools import cached_property
 
-import pytz
 import numpy as np
-from shapely.geometry import LineString, Polygon, Point
-from scipy.interpolate import interp1d
+import pytz
+import shapely
+from shapely.geometry import Polygon
 
 from kiko.bdeck import BDeckFile
-from kiko.utils import datetime_to_mjd, movement
+from kiko.utils import datetime_to_mjd_array, mjd_to_datetime64, movement
 
-TROPICAL_TYPE = set(['TD', 'TS', 'TY', 'HU', 'ST'])
-NORTHERN_HEMISPHERE_BASIN = set(['WP', 'EP', 'CP', 'AL', 'IO'])
+TROPICAL_TYPE = frozenset(['TD', 'TS', 'TY', 'HU', 'ST'])
+NORTHERN_HEMISPHERE_BASIN = frozenset(['WP', 'EP', 'CP', 'AL', 'IO'])
+_TROPICAL_ARR = np.array(sorted(TROPICAL_TYPE))
+# stdlib UTC is much cheaper than pytz for localizing and comparing
+_UTC = datetime.timezone.utc
 
 class Basin(enum.IntEnum):
     WPAC = 0
@@ -21,42 +24,66 @@ class Basin(enum.IntEnum):
     SHEM = 3
     ATL = 4
 
-@dataclass
+def _basin_property(basin: Basin):
+    # Named access to one basin in `BasinACE.arr`
+    def getter(self):
+        return float(self.arr[basin])
+
+    def setter(self, value):
+        self.arr[basin] = value
+
+    return property(getter, setter)
+
+@dataclass(init=False, repr=False, eq=False)
 class BasinACE:
-    wpac: float = 0.
-    epac: float = 0.
-    nio: float = 0.
-    shem: float = 0.
-    atl: float = 0.
+    # ACE of each basin, indexed by `Basin`
+    arr: np.ndarray
+
+    def __init__(self, wpac=0., epac=0., nio=0., shem=0., atl=0.):
+        self.arr = np.array([wpac, epac, nio, shem, atl], dtype=np.float64)
+
+    @classmethod
+    def _from_array(cls, arr: np.ndarray):
+        # Wrap an array of shape (5,) without copying
+        obj = cls.__new__(cls)
+        obj.arr = arr
+        return obj
+
+    wpac = _basin_property(Basin.WPAC)
+    epac = _basin_property(Basin.EPAC)
+    nio = _basin_property(Basin.NIO)
+    shem = _basin_property(Basin.SHEM)
+    atl = _basin_property(Basin.ATL)
 
     @property
     def total(self):
-        return self.wpac + self.epac + self.nio + self.shem + self.atl
+        return float(self.arr.sum())
 
     def set(self, basin: Basin, value):
-        match basin:
-            case Basin.WPAC:
-                self.wpac += value
-            case Basin.EPAC:
-                self.epac += value
-            case Basin.NIO:
-                self.nio += value
-            case Basin.SHEM:
-                self.shem += value
-            case Basin.ATL:
-                self.atl += value
-            case _:
-                raise ValueError('Invalid basin')
+        self.arr[Basin(basin)] += value
 
     def get(self, basin: Basin):
-        return [self.wpac, self.epac, self.nio, self.shem, self.atl][basin]
+        return float(self.arr[basin])
+
+    def __repr__(self):
+        return (f'BasinACE(wpac={self.wpac!r}, epac={self.epac!r}, '
+                f'nio={self.nio!r}, shem={self.shem!r}, atl={self.atl!r})')
+
+    def __eq__(self, other):
+        if not isinstance(other, BasinACE):
+            return NotImplemented
+        return np.array_equal(self.arr, other.arr)
+
+    __hash__ = None
 
 def ensure_utc(time: datetime.datetime):
-    if not time.tzinfo:
-        return pytz.utc.localize(time)
-    if time.tzinfo == pytz.utc:
+    tzinfo = time.tzinfo
+    if tzinfo is _UTC:
         return time
-    return time.astimezone(pytz.utc)
+    if tzinfo is None or tzinfo is pytz.utc:
+        # Same instant, no conversion needed
+        return time.replace(tzinfo=_UTC)
+    return time.astimezone(_UTC)
 
 def is_synoptic(time: datetime.datetime):
     return time.hour % 6 == 0
@@ -64,7 +91,7 @@ def is_synoptic(time: datetime.datetime):
 def is_tropical(stype: str):
     return stype in TROPICAL_TYPE
 
-def get_basin(longitude: float, latitude: float) -> Basin:
+def _classify_basin(longitude: float, latitude: float) -> Basin:
     if latitude < 0:
         return Basin.SHEM
     if longitude < 100:
@@ -86,32 +113,100 @@ def get_basin(longitude: float, latitude: float) -> Basin:
             # Complex boundary between EPAC and NATL, return EPAC for now.
             return Basin.EPAC
 
+# Basin of each 10x10 degree box. All boundaries lie on the box edges except
+# longitude 300 itself, which is EPAC but falls into the ATL box.
+# Longitude covers -180 to 360 since both conventions appear in the data.
+_LUT_RES = 10
+_LUT_LON0 = -180
+_LUT_LAT0 = -90
+_BASIN_LUT = np.array(
+    [[_classify_basin(x + _LUT_RES / 2, y + _LUT_RES / 2)
+      for y in range(_LUT_LAT0, 90, _LUT_RES)]
+     for x in range(_LUT_LON0, 360, _LUT_RES)], dtype=np.int8)
+
+def get_basin_array(longitude, latitude) -> np.ndarray:
+    # Vectorized `get_basin`, returns an int8 array of `Basin` values.
+    # Works on scalars as well.
+    longitude, latitude = np.broadcast_arrays(
+        np.asarray(longitude, dtype=np.float64),
+        np.asarray(latitude, dtype=np.float64))
+    valid = np.isfinite(longitude) & np.isfinite(latitude)
+    lon_idx = (np.where(valid, longitude, 0) - _LUT_LON0) // _LUT_RES
+    lat_idx = (np.where(valid, latitude, 0) - _LUT_LAT0) // _LUT_RES
+    lon_idx = np.clip(lon_idx, 0, _BASIN_LUT.shape[0] - 1).astype(np.intp)
+    lat_idx = np.clip(lat_idx, 0, _BASIN_LUT.shape[1] - 1).astype(np.intp)
+    basin = np.array(_BASIN_LUT[lon_idx, lat_idx])
+    # Points the table can't classify, leave them to `_classify_basin`
+    odd = ~valid | (longitude == 300)
+    if odd.any():
+        basin[odd] = [_classify_basin(x, y) for x, y in
+                      zip(longitude[odd].tolist(), latitude[odd].tolist())]
+    return basin[()]
+
+def get_basin(longitude: float, latitude: float) -> Basin:
+    return Basin(get_basin_array(longitude, latitude))
+
 class Storm(object):
 
     def __init__(self, atcfid, time, longitude, latitude, wind,
                  pressure=None, storm_type=None, name=None):
-        self.metadata = dict()
-        self.time = [ensure_utc(i) for i in time]
-        self.longitude = np.array(longitude)
-        self.latitude = np.array(latitude)
-        self.wind = np.array(wind)
-        if pressure is None:
-            self.pressure = None
+        if isinstance(time, np.ndarray) and time.dtype.kind == 'M':
+            # datetime64 array, taken as UTC. `time` is built lazily.
+            time64 = time.astype('datetime64[us]')
         else:
-            self.pressure = np.array(pressure)
+            self.time = list(map(ensure_utc, time))
+            # All times are in UTC now, drop tzinfo for numpy
+            time64 = np.array([i.replace(tzinfo=None) for i in self.time],
+                              dtype='datetime64[us]')
+        # Positions are given to 0.1 degree, single precision is plenty
+        longitude = np.asarray(longitude, dtype=np.float32)
+        latitude = np.asarray(latitude, dtype=np.float32)
+        if pressure is not None:
+            pressure = np.asarray(pressure)
+        if storm_type is not None:
+            storm_type = np.asarray(storm_type)
+        self._finalize(atcfid, time64, longitude, latitude, np.asarray(wind),
+                       pressure, storm_type, name)
+
+    @classmethod
+    def _from_arrays(cls, atcfid, time64, longitude, latitude, wind,
+                     pressure=None, storm_type=None, name=None):
+        # Skip the input coercion of `__init__`. Times must be a UTC
+        # datetime64[us] array, positions float32 arrays and the others
+        # arrays or None.
+        storm = cls.__new__(cls)
+        storm._finalize(atcfid, time64, longitude, latitude, wind, pressure,
+                        storm_type, name)
+        return storm
+
+    def _finalize(self, atcfid, time64, longitude, latitude, wind, pressure,
+                  storm_type, name):
+        self.metadata = dict()
+        self._time64 = time64
+        self.longitude = longitude
+        self.latitude = latitude
+        self.wind = wind
+        self.pressure = pressure
+        self.storm_type = storm_type
         if storm_type is None:
-            self.storm_type = None
-            self._tropical_flag = np.ones_like(self.longitude, dtype=bool) # Assume all tropical
+            self._tropical_flag = np.ones(longitude.shape, dtype=bool) # Assume all tropical
         else:
-            self.storm_type = np.array(storm_type)
-            self._tropical_flag = [is_tropical(i) for i in self.storm_type]
+            self._tropical_flag = np.isin(storm_type, _TROPICAL_ARR)
 
         self.atcf_id = atcfid # e.g. WP01
         if name:
             self.metadata['name'] = name
-        self.mjd = np.array([datetime_to_mjd(i) for i in self.time])
-        self._synoptic_flag = [is_synoptic(i) for i in self.time]
-        self.heading, self.speed = movement(self.longitude, self.latitude, self.mjd)
+        if time64.size == 0:
+            # Empty track, e.g. interpolated from a single point
+            self.atcf_season = None
+            self.full_atcf_id = None
+        else:
+            self.atcf_season = self._compute_atcf_season()
+            # Long-style ATCF ID (e.g.) WP012025
+            self.full_atcf_id = f'{self.atcf_id}{self.atcf_season}'
+        self.mjd = datetime_to_mjd_array(time64)
+        self._synoptic_flag = time64.astype('datetime64[h]').astype(np.int64) % 6 == 0
+        self.heading, self.speed = movement(longitude, latitude, self.mjd)
 
         self.flags = {'continuous': True, 'interpolated': False, 'subset': False}
 
@@ -119,47 +214,53 @@ class Storm(object):
     def from_bdeck(cls, bdeck_path):
         bdeck = BDeckFile(bdeck_path)
         bdeck.open()
-        data = bdeck.read_all(formal_advisory=False)
-        stype = np.array(data.get('raw_category'))
-        if stype is not None:
-            stype = stype[stype != '']
-            if stype.size == 0:
-                stype = None
-        storm = cls(bdeck.metadata['fullcode'], data['time'], data['lon'],
-                    data['lat'], data['wind'], data.get('pres', None), stype,
-                    bdeck.metadata.get('name', None))
+        data = bdeck.read_all_arrays(formal_advisory=False)
+        stype = data['raw_category']
+        stype = stype[stype != '']
+        if stype.size == 0:
+            stype = None
+        storm = cls._from_arrays(bdeck.metadata['fullcode'], data['time'],
+                                 data['lon'].astype(np.float32),
+                                 data['lat'].astype(np.float32), data['wind'],
+                                 data.get('pres', None), stype,
+                                 bdeck.metadata.get('name', None))
         bdeck.close()
         return storm
 
+    @cached_property
+    def time(self):
+        # List of tz-aware datetimes, only built when needed
+        return [i.replace(tzinfo=_UTC) for i in self._time64.tolist()]
+
     @property
     def start_time(self):
-        return self.time[0]
+        return self._time64[0].item().replace(tzinfo=_UTC)
 
     @property
     def end_time(self):
-        return self.time[-1]
+        return self._time64[-1].item().replace(tzinfo=_UTC)
 
     @cached_property
     def start_time_tropical(self):
         if self.storm_type is None:
             return self.start_time
-        for index, stype in enumerate(self.storm_type):
-            if stype in TROPICAL_TYPE:
-                return self.time[index]
-        return None
+        tropical_index = np.flatnonzero(self._tropical_flag)
+        if tropical_index.size == 0:
+            return None
+        return self._time64[tropical_index[0]].item().replace(tzinfo=_UTC)
 
     @cached_property
     def end_time_tropical(self):
         if self.storm_type is None:
             return self.end_time
-        for index in range(len(self.storm_type) - 1, -1, -1):
-            if self.storm_type[index] in TROPICAL_TYPE:
-                return self.time[index]
-        return None
+        tropical_index = np.flatnonzero(self._tropical_flag)
+        if tropical_index.size == 0:
+            return None
+        return self._time64[tropical_index[-1]].item().replace(tzinfo=_UTC)
 
     @cached_property
     def max_wind(self):
-        return max(self.wind)
+        return self.wind.max().item()
 
     @property
     def atcf_basin(self):
@@ -169,32 +270,45 @@ class Storm(object):
     def atcf_number(self):
         return int(self.atcf_id[2:])
 
+    @cached_property
+    def _ace_mask(self):
+        # Synoptic tropical records with at least TS intensity count for ACE
+        return self._tropical_flag & self._synoptic_flag & (self.wind >= 35)
+
+    @cached_property
+    def daily_ace_matrix(self) -> tuple[int, np.ndarray]:
+        # Dense ACE of each day since the first day with ACE, by basin.
+        # Returns MJD of the first day and array of shape (days, basins).
+        ace_flag = self._ace_mask
+        wind = self.wind[ace_flag]
+        lon = self.longitude[ace_flag]
+        lat = self.latitude[ace_flag]
+        mjd_int = self.mjd[ace_flag].astype(np.int64)
+        if mjd_int.size == 0:
+            return 0, np.zeros((0, len(Basin)))
+        ace = wind.astype(np.float64) ** 2 / 1e4
+        basin = get_basin_array(lon, lat)
+        mjd_start = int(mjd_int.min())
+        matrix = np.zeros((int(mjd_int.max()) - mjd_start + 1, len(Basin)))
+        np.add.at(matrix, (mjd_int - mjd_start, basin), ace)
+        return mjd_start, matrix
+
     @cached_property
     def daily_ace(self):
         # Group ace by day, then by basin
         data: dict[int, BasinACE] = dict()
         # Use MJD as key
-        valid_flag = np.logical_and(self._tropical_flag, self._synoptic_flag)
-        ace_flag = np.logical_and(valid_flag, self.wind >= 35)
-        wind = self.wind[ace_flag]
-        lon = self.longitude[ace_flag]
-        lat = self.latitude[ace_flag]
-        mjd_filtered = self.mjd[ace_flag]
-        ace = (wind ** 2) / 10000
-        for _ace, _lon, _lat, _mjd in zip(ace, lon, lat, mjd_filtered):
-            basin = get_basin(_lon, _lat)
-            mjd = int(_mjd)
-            if mjd not in data:
-                data[mjd] = BasinACE()
-            data[mjd].set(basin, _ace)
+        mjd_start, matrix = self.daily_ace_matrix
+        days = np.flatnonzero(matrix.any(axis=1))
+        for day, row in zip(days.tolist(), matrix[days]):
+            data[mjd_start + day] = BasinACE._from_array(row)
         return data
 
     @cached_property
     def total_ace(self):
-        return sum([i.total for i in self.daily_ace.values()])
+        return float(self.daily_ace_matrix[1].sum())
 
-    @cached_property
-    def atcf_season(self):
+    def _compute_atcf_season(self):
         start_year = self.start_time.year
         end_year = self.end_time.year
         if start_year == end_year:
@@ -210,11 +324,6 @@ class Storm(object):
             return end_year
         return start_year
 
-    @property
-    def full_atcf_id(self):
-        '''Long-style ATCF ID (e.g.) WP012025'''
-        return f'{self.atcf_id}{self.atcf_season}'
-
     @cached_property
     def tropical_interval(self):
         pass
@@ -224,28 +333,30 @@ class Storm(object):
 
     @cached_property
     def _geom(self):
-        return LineString(np.array([self.longitude, self.latitude]))
+        # (N, 2) coordinates, one vertex per track point
+        return shapely.linestrings(np.column_stack((self.longitude, self.latitude)))
 
     def sel_by_bbox(self, bbox: Polygon):
-        cont_flag = True
-        sel_idx = []
         bbox_buffered = bbox.buffer(0.01)
-        for i, (x, y) in enumerate(zip(self.longitude, self.latitude)):
-            if bbox_buffered.contains(Point(x, y)):
-                if cont_flag and len(sel_idx) != 0:
-                    if (i - sel_idx[-1]) > 1:
-                        cont_flag = False
-                sel_idx.append(i)
-        if not sel_idx:
+        # Cheap test on bounds first, then exact test on the candidates only
+        minx, miny, maxx, maxy = bbox_buffered.bounds
+        lon, lat = self.longitude, self.latitude
+        candidate = np.flatnonzero((lon >= minx) & (lon <= maxx) &
+                                   (lat >= miny) & (lat <= maxy))
+        inside = shapely.contains_xy(bbox_buffered, lon[candidate], lat[candidate])
+        sel_idx = candidate[inside]
+        if sel_idx.size == 0:
             return None
-        sel_time = [self.time[i] for i in sel_idx]
+        cont_flag = bool(np.all(np.diff(sel_idx) == 1))
+        sel_idx = sel_idx.tolist()
+        sel_time = self._time64[sel_idx]
         sel_lon = self.longitude[sel_idx]
         sel_lat = self.latitude[sel_idx]
         sel_wind = self.wind[sel_idx]
         sel_pressure = self.pressure[sel_idx] if self.pressure is not None else None
         sel_storm_type = self.storm_type[sel_idx] if self.storm_type is not None else None
-        s = Storm(self.atcf_id, sel_time, sel_lon, sel_lat, sel_wind, sel_pressure,
-                  sel_storm_type, self.metadata.get('name', None))
+        s = Storm._from_arrays(self.atcf_id, sel_time, sel_lon, sel_lat, sel_wind,
+                               sel_pressure, sel_storm_type, self.metadata.get('name', None))
         s.flags['continuous'] = cont_flag
         if len(sel_idx) != len(self.longitude):
             s.flags['subset'] = True
@@ -259,27 +370,37 @@ class Storm(object):
 
         new_times = np.arange(self.mjd[0], self.mjd[-1], hour_interval / 24.0)
 
-        interp_lon = interp1d(self.mjd, self.longitude, kind='linear', fill_value="extrapolate")
-        interp_lat = interp1d(self.mjd, self.latitude, kind='linear', fill_value="extrapolate")
-        interp_wind = interp1d(self.mjd, self.wind, kind='linear', fill_value="extrapolate")
+        # Locate new times once, the weights are shared by all the fields
+        idx = np.searchsorted(self.mjd, new_times, side='right') - 1
+        idx = np.clip(idx, 0, len(self.mjd) - 2)
+        t0 = self.mjd[idx]
+        dt = self.mjd[idx + 1] - t0
+        weight = np.divide(new_times - t0, dt, out=np.zeros_like(new_times),
+                           where=dt != 0)
+
+        def _linear(values):
+            left = values[idx]
+            return left + (values[idx + 1] - left) * weight
 
-        new_longitude = interp_lon(new_times)
-        new_latitude = interp_lat(new_times)
-        new_wind = interp_wind(new_times)
+        new_longitude = _linear(self.longitude)
+        new_latitude = _linear(self.latitude)
+        new_wind = _linear(self.wind)
 
         if self.pressure is not None:
-            interp_pressure = interp1d(self.mjd, self.pressure, kind='linear', fill_value="extrapolate")
-            new_pressure = interp_pressure(new_times)
+            new_pressure = _linear(self.pressure)
         else:
             new_pressure = None
 
         if self.storm_type is not None:
-            interp_storm_type = interp1d(self.mjd, self.storm_type, kind='nearest', fill_value="extrapolate")
-            new_storm_type = interp_storm_type(new_times)
+            # Nearest neighbour, ties go to the earlier point. Works for
+            # string types, which interp1d cannot handle.
+            new_storm_type = np.where(weight <= 0.5, self.storm_type[idx],
+                                      self.storm_type[idx + 1])
         else:
             new_storm_type = None
 
-        new_time = [self.time[0] + datetime.timedelta(days=(mjd - self.mjd[0])) for mjd in new_times]
+        # Offsets from the first point keep its exact microseconds
+        new_time = self._time64[0] + (mjd_to_datetime64(new_times) - mjd_to_datetime64(self.mjd[0]))
 
         s = Storm(self.atcf_id, new_time, new_longitude, new_latitude, new_wind, new_pressure, new_storm_type, self.metadata.get('name', None))
         s.flags['interpolated'] = True
@@ -1,7 +1,10 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import numpy as np
 
+MJD_EPOCH = np.datetime64('1858-11-17T00:00', 'us')
+MJD_EPOCH_ORDINAL = 678576 # datetime.date(1858, 11, 17).toordinal()
+
 def datetime_to_mjd(dt: datetime) -> float:
     """
     Convert a datetime object to Modified Julian Date (MJD).
@@ -13,29 +16,28 @@ def datetime_to_mjd(dt: datetime) -> float:
     Returns:
         float: Modified Julian Date
     """
-    # First calculate the Julian Date
-    year = dt.year
-    month = dt.month
-    day = dt.day
-
-    # If January or February, treat as 13th or 14th month of previous year
-    if month <= 2:
-        year -= 1
-        month += 12
+    # Proleptic Gregorian ordinal gives the day number directly, which is
+    # much cheaper than the Julian Date formula
+    mjd = dt.toordinal() - MJD_EPOCH_ORDINAL
 
-    # Julian Date calculation
-    a = year // 100
-    b = 2 - a + (a // 4)
+    # Add time component
+    return mjd + (dt.hour + dt.minute/60.0 + dt.second/3600.0 + dt.microsecond/3600000000.0) / 24.0
 
-    jd = (int(365.25 * (year + 4716)) +
-          int(30.6001 * (month + 1)) +
-          day + b - 1524.5)
+def datetime_to_mjd_array(times) -> np.ndarray:
+    """
+    Convert a sequence of datetimes to Modified Julian Dates at once.
+    Like `datetime_to_mjd`, the wall clock time is used and tzinfo is ignored.
 
-    # Add time component
-    jd += (dt.hour + dt.minute/60.0 + dt.second/3600.0 + dt.microsecond/3600000000.0) / 24.0
+    Args:
+        times (array_like): Python datetime objects or a datetime64 array
 
-    # Convert to MJD
-    return jd - 2400000.5
+    Returns:
+        np.ndarray: Modified Julian Dates
+    """
+    if not (isinstance(times, np.ndarray) and times.dtype.kind == 'M'):
+        times = [t.replace(tzinfo=None) for t in times]
+    times = np.asarray(times, dtype='datetime64[us]')
+    return (times - MJD_EPOCH) / np.timedelta64(1, 'D')
 
 def mjd_to_datetime(mjd: float) -> datetime:
     """
@@ -81,70 +83,85 @@ def mjd_to_datetime(mjd: float) -> datetime:
 
     return datetime(year, month, day, hours, minutes, seconds, microseconds)
 
+def mjd_to_datetime64(mjd) -> np.ndarray:
+    """
+    Convert Modified Julian Dates to a datetime64 array at once.
 
-def find_overlaps(intervals: list[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime, list[int]]]:
-    # Create events: each event is a tuple (time, event_type, index)
-    events = []
-    for i, (start, end) in enumerate(intervals):
-        events.append((start, 'start', i))
-        events.append((end, 'end', i))
-
-    # Sort events by time; if times are equal, start events come first.
-    events.sort(key=lambda x: (x[0], 0 if x[1] == 'start' else 1))
-
-    active = set()  # active set of interval indices
-    overlaps = []   # to store output: (overlap_start, overlap_end, [indices])
-    prev_time = None
-
-    for time, event_type, idx in events:
-        # If we have moved time and at least two intervals are active,
-        # record the overlapping segment.
-        if prev_time is not None and time > prev_time and len(active) >= 2:
-            overlaps.append((prev_time, time, sorted(active)))
+    Args:
+        mjd (array_like): Modified Julian Dates
 
-        # Process the current event
-        if event_type == 'start':
-            active.add(idx)
-        else:  # event_type == 'end'
-            active.remove(idx)
+    Returns:
+        np.ndarray: datetime64[us] array, rounded to microseconds
+    """
+    offset_us = np.round(np.asarray(mjd, dtype=np.float64) * 86400e6)
+    return MJD_EPOCH + offset_us.astype(np.int64).astype('timedelta64[us]')
 
-        prev_time = time
 
+def find_overlaps(intervals: list[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime, list[int]]]:
+    n = len(intervals)
+    if n == 0:
+        return []
+    # Events: starts first, then ends. Times are converted to integer
+    # microseconds from a reference so both naive and aware datetimes work.
+    times = [i[0] for i in intervals] + [i[1] for i in intervals]
+    ref = times[0]
+    offset = np.array([(t - ref) // timedelta(microseconds=1) for t in times],
+                      dtype=np.int64)
+    is_end = np.repeat(np.array([0, 1], dtype=np.int8), n)
+    # Sort events by time; if times are equal, start events come first.
+    # The tie-break is encoded in the lowest bit, so one argsort is enough.
+    order = np.argsort(offset * 2 + is_end, kind='stable')
+    # Number of active intervals after each event
+    active = np.cumsum(np.where(is_end[order], -1, 1))
+    t_sorted = offset[order]
+    # Segment between two events with at least two intervals active
+    seg = np.flatnonzero((t_sorted[1:] > t_sorted[:-1]) & (active[:-1] >= 2))
+    if seg.size == 0:
+        return []
+    # Position of start/end event of each interval in the sorted events,
+    # members of a segment are intervals started but not ended before it.
+    # Evaluated per segment to keep memory linear in the number of intervals.
+    pos = np.empty(2 * n, dtype=np.int64)
+    pos[order] = np.arange(2 * n)
+    start_pos, end_pos = pos[:n], pos[n:]
+    overlaps = []   # to store output: (overlap_start, overlap_end, [indices])
+    for k in seg.tolist():
+        members = np.flatnonzero((start_pos <= k) & (end_pos > k))
+        overlaps.append((times[order[k]], times[order[k + 1]], members.tolist()))
     return overlaps
 
 def movement(longitude, latitude, timestamp):
     # The output size is 1 less then the input size
-    # Extract consecutive pairs of coordinates
-    lat1, lat2 = latitude[:-1], latitude[1:]
-    lon1, lon2 = longitude[:-1], longitude[1:]
-    
-    # Convert to radians
-    lat1_rad, lon1_rad = np.radians(lat1), np.radians(lon1)
-    lat2_rad, lon2_rad = np.radians(lat2), np.radians(lon2)
-    
+    # Convert to radians once, sin/cos of each point are shared by the
+    # consecutive pairs instead of being computed twice
+    lat_rad = np.radians(latitude)
+    lon_rad = np.radians(longitude)
+    sin_lat = np.sin(lat_rad)
+    cos_lat = np.cos(lat_rad)
+    sin_lat1, sin_lat2 = sin_lat[:-1], sin_lat[1:]
+    cos_lat1, cos_lat2 = cos_lat[:-1], cos_lat[1:]
+
     # Calculate heading
-    dlon = lon2_rad - lon1_rad
-    y = np.sin(dlon) * np.cos(lat2_rad)
-    x = np.cos(lat1_rad) * np.sin(lat2_rad) - np.sin(lat1_rad) * np.cos(lat2_rad) * np.cos(dlon)
+    dlon = np.diff(lon_rad)
+    y = np.sin(dlon) * cos_lat2
+    x = cos_lat1 * sin_lat2 - sin_lat1 * cos_lat2 * np.cos(dlon)
     heading = np.degrees(np.arctan2(y, x))
     # Convert to 0-360 degrees
-    heading = (heading + 360) % 360
-    
+    heading += 360
+    heading %= 360
+
     # Calculate distance using haversine formula
     R = 6371.0  # Earth's radius in km
-    dlat = lat2_rad - lat1_rad
-    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
+    dlat = np.diff(lat_rad)
+    a = np.sin(dlat / 2)**2 + cos_lat1 * cos_lat2 * np.sin(dlon / 2)**2
     c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    distance_km = R * c
-    distance_nm = distance_km / 1.852  # Convert km to nautical miles
-    
+    distance_nm = c * (R / 1.852)  # Convert km to nautical miles
+
     # Calculate speed from MJD timestamps
-    # MJD time difference in days
-    time_diff_days = timestamp[1:] - timestamp[:-1]
-    # Convert to hours (1 day = 24 hours)
-    time_diff_hours = time_diff_days * 24
-    
+    # MJD time difference in days, convert to hours (1 day = 24 hours)
+    time_diff_hours = np.diff(timestamp) * 24
+
     mask = time_diff_hours > 0
     speed_kt = np.zeros_like(distance_nm)
     speed_kt[mask] = distance_nm[mask] / time_diff_hours[mask]
-    return heading, speed_kt
\ No newline at end of file
+    return heading, speed_kt